@@ -2,6 +2,7 @@ import sys
 import logging
 import argparse
 import fnmatch
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from abc import ABC
 from abc import abstractmethod
 from collections import OrderedDict
@@ -10,9 +11,11 @@ import prettytable
 
 from . import logger, CabinError, AbstractAttribute
 from . import registry
+from . import io
 from .mysql import MYSQL
+from .core import table_data_lengths
 from .db import ImportedTable, imported_tables
-from .graph import glob_datasets, build_historical_dag, draw_code_dag
+from .graph import glob_datasets, build_historical_dag, draw_code_dag, dependency_graph
 
 
 def all_table_datasets(tag):
@@ -25,6 +28,52 @@ def all_table_datasets(tag):
     return classes
 
 
+def _produce(cls, gunzip_threads):
+    # executed in worker processes of produce_in_parallel(); each worker gets
+    # its share of the cores for parallel decompression.
+    io.PARALLEL_GUNZIP_THREADS = gunzip_threads
+    cls().produce_recursive()
+
+
+def produce_in_parallel(classes, max_workers):
+    """Produces the given datasets, and their dependencies, using a pool of
+    worker processes. A dataset is submitted as soon as all its dependencies
+    are produced, so that no two workers ever produce the same (shared)
+    ancestor and a slow dataset only holds back its own descendants. Each
+    worker talks to MySQL over its own connections."""
+    G = dependency_graph(classes)
+    # number of dependencies of each dataset that are not yet produced
+    n_waiting = {cls: G.in_degree(cls) for cls in G}
+    gunzip_threads = max(1, io.PARALLEL_GUNZIP_THREADS // max_workers)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+
+        def submit(ready):
+            for cls in sorted(ready, key=lambda cls: cls.__name__):
+                running[pool.submit(_produce, cls, gunzip_threads)] = cls
+
+        submit(cls for cls, n in n_waiting.items() if n == 0)
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                ready = []
+                for future in done:
+                    cls = running.pop(future)
+                    future.result() # re-raises worker exceptions
+                    for child in G.successors(cls):
+                        n_waiting[child] -= 1
+                        if n_waiting[child] == 0:
+                            ready.append(child)
+                submit(ready)
+        except BaseException:
+            # the pool's exit waits for all submitted datasets: drop those not
+            # started yet so that the error is reported without delay.
+            for future in running:
+                future.cancel()
+            raise
+
+
 class AppCommand(ABC):
     name = AbstractAttribute()
     help = None
@@ -85,10 +134,7 @@ class DescribeCommand(AppCommand):
 
     def run(self):
         ds_type = self.app.args.dataset
-        hdatasets = [
-            hd for hd in imported_tables()
-            if hd.type == ds_type
-        ]
+        hdatasets = list(imported_tables(types={ds_type}))
         if not hdatasets:
             # nothing found: let exit code still be zero, just print a warning
             logger.warn('No tables imported for dataset "%s"' % ds_type)
@@ -142,13 +188,11 @@ class PruneCommand(AppCommand):
         self.parser.add_argument('dataset', nargs='?', help="optional dataset name, possibly glob")
 
     def run(self):
+        class_names = None
         if self.app.args.dataset:
-            class_names = [cls.__name__ for cls in glob_datasets(self.app.args.dataset, tables_only=False)]
-
-        for hdataset in imported_tables():
-            if self.app.args.dataset and hdataset.type not in class_names:
-                continue
+            class_names = {cls.__name__ for cls in glob_datasets(self.app.args.dataset, tables_only=False)}
 
+        for hdataset in imported_tables(types=class_names):
             if not hdataset.is_latest():
                 if (self.app.args.dry_run):
                     logger.info("(dry-run) Pruning outdated table: %s" % hdataset.name)
@@ -167,6 +211,8 @@ class ImportCommand(AppCommand):
         self.parser.add_argument('--all', action='store_true', help="import all table datasets")
         self.parser.add_argument('--tag', help="only import datasets with TAG, only valid with --all")
         self.parser.add_argument('-n', '--dry-run', action='store_true', help="do not actually import, just show a synopsis")
+        self.parser.add_argument('-p', '--parallel', type=int, default=1, metavar='N',
+                                 help="produce up to N independent datasets concurrently, default: 1")
 
     def run(self):
         if self.app.args.all:
@@ -187,6 +233,10 @@ class ImportCommand(AppCommand):
             logger.error("No datasets matching %s." % self.app.args.dataset)
             return 1
 
+        if self.app.args.parallel > 1 and not self.app.args.dry_run:
+            produce_in_parallel(classes, max_workers=self.app.args.parallel)
+            return
+
         for cls in classes:
             ds = cls()
             ds.produce_recursive(dry_run=self.app.args.dry_run)
@@ -244,21 +294,28 @@ class StatusCommand(AppCommand):
         hdatasets = list(imported_tables())
         hdag = build_historical_dag(hdatasets)
 
-        for hdataset in hdatasets:
-            ds_type = hdataset.type
-            if ds_type not in class_names:
-                continue
-
-            data_stats = hdataset.get_data_stats()
-            row = [
-                hdataset.formula['version'] + ('  ✓' if hdataset.is_latest() else '  !'),
-                hdataset.name,
-                data_stats['n_rows'],
-                data_stats['size'],
-                self._truncate_list(list(hdataset.inputs.keys())),
-                self._truncate_list(list(hdag.successors(hdataset.name))),
-            ]
-            ptable.add_row(row)
+        # one connection for all per-table queries
+        with MYSQL.cursor() as cursor:
+            data_lengths = table_data_lengths(cursor=cursor)
+
+            for hdataset in hdatasets:
+                ds_type = hdataset.type
+                if ds_type not in class_names:
+                    continue
+
+                data_stats = hdataset.get_data_stats(
+                    data_length=data_lengths.get(hdataset.name),
+                    cursor=cursor,
+                )
+                row = [
+                    hdataset.formula['version'] + ('  ✓' if hdataset.is_latest() else '  !'),
+                    hdataset.name,
+                    data_stats['n_rows'],
+                    data_stats['size'],
+                    self._truncate_list(list(hdataset.inputs.keys())),
+                    self._truncate_list(list(hdag.successors(hdataset.name))),
+                ]
+                ptable.add_row(row)
 
         print(ptable)
 
@@ -1,5 +1,6 @@
 import json
 import hashlib
+from functools import lru_cache
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 
@@ -16,6 +17,17 @@ def calculate_sha(obj, num_chars=8):
     return m.hexdigest()[:num_chars]
 
 
+@lru_cache(maxsize=None)
+def latest_formula_sha(type_):
+    """Returns the formula sha of the given dataset type as per the current
+    state of code, or None if the type is unknown. Memoized: the registry does
+    not change during the lifetime of a process."""
+    from .registry import TYPE_REGISTRY
+    if type_ not in TYPE_REGISTRY:
+        return None
+    return TYPE_REGISTRY[type_]().formula_sha
+
+
 class Dataset(ABC):
     """Dataset classes represent datatset types and Dataset instances represent
     dataset instances. All you need to do to implement a new Dataset class is
@@ -119,23 +131,25 @@ class Dataset(ABC):
     # Everything below is supposed to Just Work. Subclasses shouldn't (need to)
     # override any of them.
     def produce_recursive(self, dry_run=False):
+        # pass self, not self.description, to the logger: the description is
+        # only rendered (via __str__) if the record is actually emitted.
         if self.exists():
-            logger.debug('exists:'.ljust(9) + self.description)
+            logger.debug('%-9s%s', 'exists:', self)
         else:
             for inp in self.inputs.values():
                 # recurse
                 inp.produce_recursive(dry_run=dry_run)
 
-            logger.info('produce:'.ljust(10) + self.description)
+            logger.info('%-10s%s', 'produce:', self)
 
             if not dry_run:
                 self.produce()
 
                 if hasattr(self, 'check'):
-                    logger.info('check:'.ljust(10) + self.description)
+                    logger.info('%-10s%s', 'check:', self)
                     self.check()
 
-                logger.info('produced:'.ljust(10) + self.description)
+                logger.info('%-10s%s', 'produced:', self)
 
     def root_versions(self):
         # returns a list of versions of all root ancestors. Root ancestors are
@@ -167,11 +181,16 @@ class Dataset(ABC):
         # A unique representation of the Dataset's version formula. To be used
         # as building block of paths or table names. Everything but the formula
         # sha is only included for intelligibility.
-        return '{type}::{roots}::{sha}'.format(
-            type=self.type,
-            roots='::'.join(self.root_versions()[:2]),
-            sha=self.formula_sha,
-        )
+        #
+        # Cached: like the formula it is derived from, it is fixed at
+        # instantiation, but walks all ancestors to find root versions.
+        if not hasattr(self, '_name'):
+            self._name = '{type}::{roots}::{sha}'.format(
+                type=self.type,
+                roots='::'.join(self.root_versions()[:2]),
+                sha=self.formula_sha,
+            )
+        return self._name
 
     @property
     def is_root(self):
@@ -180,12 +199,17 @@ class Dataset(ABC):
     @property
     def description(self):
         # A human readable description for the dataset
-        return '{type} with formula sha {sha} and root versions {roots}'.format(
-            type=self.type.ljust(30),
-            # this is the human readable version, set-ify
-            roots=', '.join(set(self.root_versions())),
-            sha=self.formula_sha,
-        )
+        if not hasattr(self, '_description'):
+            self._description = '{type} with formula sha {sha} and root versions {roots}'.format(
+                type=self.type.ljust(30),
+                # this is the human readable version, set-ify
+                roots=', '.join(set(self.root_versions())),
+                sha=self.formula_sha,
+            )
+        return self._description
+
+    def __str__(self):
+        return self.description
 
     def __eq__(self, other):
         return self.formula_sha == other.formula_sha
@@ -234,15 +258,9 @@ class HistoricalDataset:
         garbage collection at all levels (tables, downloaded files,
         intermediate tables).
         """
-        from .registry import TYPE_REGISTRY
-        type_ = self.formula['type']
-        if type_ not in TYPE_REGISTRY:
-            # don't even know who this dataset is
-            return False
-
-        cls = TYPE_REGISTRY[type_]
-        latest = cls()
-        return latest.formula_sha == self.formula_sha
+        # note: if we don't even know who this dataset is the latest sha is
+        # None and it is not latest.
+        return latest_formula_sha(self.formula['type']) == self.formula_sha
 
     # TODO unify with ImportedTable
     def sql_drop_table(self):
@@ -256,8 +274,16 @@ class HistoricalDataset:
             cursor.execute(self.sql_drop_table())
             cursor.execute(self.sql_drop_from_system())
 
-    def get_data_stats(self):
-        with MYSQL.cursor() as cursor:
+    def get_data_stats(self, data_length=None, cursor=None):
+        """Returns the number of rows and size of this dataset's table. The
+        latter is looked up unless given as `data_length`, e.g. as looked up
+        for all tables at once by table_data_lengths(). Pass a `cursor` to
+        reuse one connection across many tables."""
+        if cursor is None:
+            with MYSQL.cursor() as cursor:
+                return self.get_data_stats(data_length=data_length, cursor=cursor)
+
+        if data_length is None:
             cursor.execute("""
                 SELECT data_length
                 FROM information_schema.tables
@@ -266,13 +292,28 @@ class HistoricalDataset:
             # data_length in information_schema is only an estimate
             data_length = cursor.fetchone()[0]
 
-            cursor.execute('SELECT count(*) FROM `{table}`;'.format(table=self.name))
-            # caution: don't use the table_rows column of information_schema,
-            # it's approximate (can be very misleading) and we have an easy way
-            # to get exact values.
-            n_rows = cursor.fetchone()[0]
+        cursor.execute('SELECT count(*) FROM `{table}`;'.format(table=self.name))
+        # caution: don't use the table_rows column of information_schema,
+        # it's approximate (can be very misleading) and we have an easy way
+        # to get exact values.
+        n_rows = cursor.fetchone()[0]
 
         return {
             'n_rows': '{:,}'.format(n_rows), # add thousands comma separator
             'size': naturalsize(data_length)
         }
+
+
+def table_data_lengths(cursor=None):
+    """Returns a dictionary of table name to data length (an estimate) for
+    all tables of the current database, in a single query."""
+    if cursor is None:
+        with MYSQL.cursor() as cursor:
+            return table_data_lengths(cursor=cursor)
+
+    cursor.execute("""
+        SELECT table_name, data_length
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE();
+    """)
+    return dict(cursor.fetchall())
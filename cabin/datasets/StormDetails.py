@@ -1,4 +1,4 @@
-from cabin.db import RecordByRecordImportedTable
+from cabin.db import BulkImportedTable
 from cabin.files import LocalFile, ExternalFile
 from cabin.io import read_csv
 
@@ -29,8 +29,8 @@ class StormDetailsFile(LocalFile):
     extension = 'csv'
 
 
-class StormDetailsTable(RecordByRecordImportedTable):
-    version = '1'
+class StormDetailsTable(BulkImportedTable):
+    version = '2'
     depends = [StormDetailsFile]
 
     columns = [
@@ -48,6 +48,8 @@ class StormDetailsTable(RecordByRecordImportedTable):
         'event_narrative'
     ]
 
+    indexes = ['INDEX (month_name)']
+
     @property
     def schema(self):
         return """
@@ -63,8 +65,7 @@ class StormDetailsTable(RecordByRecordImportedTable):
                 magnitude_type    VARCHAR(255) NOT NULL,
                 category          VARCHAR(255) NOT NULL,
                 tor_f_scale       VARCHAR(255) NOT NULL,
-                event_narrative           TEXT NOT NULL,
-                INDEX (month_name)
+                event_narrative           TEXT NOT NULL
             );
         """
 
@@ -1,13 +1,24 @@
+import os
 import json
+import tempfile
 from abc import abstractmethod
+from operator import itemgetter
+from contextlib import contextmanager
 
-from . import logger, settings, AbstractAttribute
+from . import logger, settings, CabinError, AbstractAttribute
+from .io import FifoWriter
 from .mysql import MYSQL
 from .core import Dataset, HistoricalDataset
 from .settings import CABIN_SYSTEM_TABLE
 
 
 class ImportedTable(Dataset):
+    indexes = []
+    """Secondary index definitions, e.g. `INDEX (col)` or `UNIQUE (col)`,
+    added with a single `ALTER TABLE` once all data is imported: building an
+    index over a populated table is a sort, much cheaper than maintaining it
+    for every inserted row. These should not be repeated in `schema`."""
+
     @property
     @abstractmethod
     def schema(self):
@@ -19,7 +30,11 @@ class ImportedTable(Dataset):
 
     @property
     def input_table_names(self):
-        return {type: input.table_name for type, input in self.inputs.items()}
+        # cached: inputs are fixed at instantiation and this is typically
+        # formatted into queries in read() or import_table().
+        if not hasattr(self, '_input_table_names'):
+            self._input_table_names = {type: input.table_name for type, input in self.inputs.items()}
+        return self._input_table_names
 
     def exists(self):
         with MYSQL.cursor() as cursor:
@@ -35,6 +50,7 @@ class ImportedTable(Dataset):
             with MYSQL.cursor() as cursor:
                 self._create_table(cursor)
                 self.import_table(cursor)
+                self._add_indexes(cursor)
                 self._update_system_table(cursor)
                 logger.info("Imported %s rows to table: %s " % (self.get_nrows(cursor), self.table_name))
         except BaseException as e:
@@ -72,6 +88,15 @@ class ImportedTable(Dataset):
         query = self.schema.format(table=self.table_name).strip()
         cursor.execute(query)
 
+    def _add_indexes(self, cursor):
+        if not self.indexes:
+            return
+        logger.info('Building %d indexes for table: %s' % (len(self.indexes), self.table_name))
+        cursor.execute('ALTER TABLE `{table}` {indexes};'.format(
+            table=self.table_name,
+            indexes=', '.join('ADD ' + index for index in self.indexes),
+        ))
+
     def _update_system_table(self, cursor):
         query = ("""
             INSERT INTO `%s`
@@ -99,17 +124,46 @@ class RecordByRecordImportedTable(ImportedTable):
     (as per SQL schema) which filters and renames the columns read from
     original source. By default no renaming or filtering is performed."""
 
+    batch_size = 10000
+    """Number of records sent to MySQL per `executemany`, which the driver
+    turns into a single multi-row INSERT."""
+
     @property
     def sql_insert(self):
         return 'INSERT INTO `{table}` ({cols}) VALUES ({vals})'.format(
             table=self.table_name,
             cols=', '.join('`%s`' % col for col in self.columns),
-            vals=', '.join('%({c})s'.format(c=col) for col in self.columns)
+            vals=', '.join(['%s'] * len(self.columns))
         )
 
+    @property
+    def column_getter(self):
+        # built once per table rather than looping over columns per record
+        if not hasattr(self, '_column_getter'):
+            getter = itemgetter(*self.columns)
+            if len(self.columns) == 1:
+                # itemgetter returns a bare value, not a tuple, for a single key
+                self._column_getter = lambda record: (getter(record),)
+            else:
+                self._column_getter = getter
+        return self._column_getter
+
+    def values(self, record):
+        """Returns the values of a transformed record in the order of
+        `columns`, as bound to the placeholders of `sql_insert`."""
+        return self.column_getter(record)
+
     def import_table(self, cursor):
+        sql_insert = self.sql_insert
+        batch = []
         for row in self.read():
-            cursor.execute(self.sql_insert, self.transform(row))
+            batch.append(self.values(self.transform(row)))
+            if len(batch) == self.batch_size:
+                cursor.executemany(sql_insert, batch)
+                batch = []
+
+        if batch:
+            cursor.executemany(sql_insert, batch)
 
     def transform(self, record):
         if self.field_mappings is None:
@@ -121,17 +175,135 @@ class RecordByRecordImportedTable(ImportedTable):
             }
 
 
-def imported_tables(latest_only=False, type=None):
-    query = 'SELECT name, formula, sha FROM `{system}`'.format(system=CABIN_SYSTEM_TABLE)
+# LOAD DATA's default input format: tab separated, backslash escaped, \N for NULL
+LOAD_DATA_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\0': '\\0',
+})
+
+
+def load_data_field(value):
+    """Serializes a single value as a field of a LOAD DATA input file.
+    Binary (bytes) values have no text form and are not supported."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        # as the driver binds them in an INSERT; str() would give 'True'
+        return '1' if value else '0'
+    if isinstance(value, (bytes, bytearray)):
+        raise CabinError('Cannot bulk load binary value %r, use RecordByRecordImportedTable' % value[:20])
+    return str(value).translate(LOAD_DATA_ESCAPES)
+
+
+class BulkImportedTable(RecordByRecordImportedTable):
+    """Same contract as RecordByRecordImportedTable (read(), columns,
+    field_mappings) but instead of one INSERT per record, all records are
+    streamed as TSV through a named pipe and imported with a single
+    `LOAD DATA LOCAL INFILE` statement. This saves a client/server round trip
+    and an SQL parse per record, and the data never touches the disk.
+
+    Values must have a text form (no bytes), see load_data_field(). The
+    server's `local_infile` must be on. LOAD DATA LOCAL never fails on bad
+    data, it truncates, coerces or skips with a warning instead; any
+    warning fails the import as an error would on the INSERT path."""
+
+    relax_checks = settings.CABIN_BULK_LOAD_RELAX_CHECKS
+    """Whether to disable InnoDB unique and foreign key checks for the
+    duration of the import, off by default; set CABIN_BULK_LOAD_RELAX_CHECKS=1
+    to turn it on. Faster, but duplicates on UNIQUE keys of `schema` may go
+    undetected and rows violating foreign keys are accepted silently; UNIQUE
+    keys in `indexes` are still validated when they are built."""
+
+    @property
+    def sql_load_data(self):
+        # the file path is bound as a parameter (quoted and escaped by the
+        # driver) rather than formatted into the statement.
+        return """
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE `{table}`
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t'
+            ({cols});
+        """.format(
+            table=self.table_name,
+            cols=', '.join('`%s`' % col for col in self.columns),
+        )
+
+    def write_records(self, file):
+        # one writelines() over a generator of lines, rather than a write()
+        # call per record. Note: csv.writer is not used since it cannot emit
+        # the \N that LOAD DATA expects for NULL.
+        values, transform = self.values, self.transform
+        file.writelines(
+            '\t'.join(map(load_data_field, values(transform(row)))) + '\n'
+            for row in self.read()
+        )
+
+    @contextmanager
+    def relaxed_checks(self, cursor):
+        if not self.relax_checks:
+            yield
+            return
+
+        cursor.execute('SET unique_checks = 0, foreign_key_checks = 0;')
+        yield
+        # on failure the session is discarded along with its settings.
+        cursor.execute('SET unique_checks = 1, foreign_key_checks = 1;')
+
+    def import_table(self, cursor):
+        # records are serialized in a writer thread while MySQL consumes the
+        # other end of the pipe: reading/transforming overlaps with the
+        # server parsing and inserting rows.
+        with self.relaxed_checks(cursor), tempfile.TemporaryDirectory() as tmpdir:
+            fifo = os.path.join(tmpdir, 'records.tsv')
+            os.mkfifo(fifo)
+            writer = FifoWriter(fifo, self.write_records)
+            writer.start()
+            try:
+                cursor.execute(self.sql_load_data, (fifo,))
+            finally:
+                writer.close()
+
+            # an error in read() closes the pipe early, which MySQL cannot
+            # tell apart from the end of the data.
+            if writer.error is not None:
+                raise writer.error
+
+            self.assert_no_warnings(cursor)
+
+    def assert_no_warnings(self, cursor):
+        n_warnings = cursor.warning_count
+        if not n_warnings:
+            return
+
+        cursor.execute('SHOW WARNINGS LIMIT 5;')
+        messages = [message for _, _, message in cursor.fetchall()]
+        raise CabinError('Loading %s produced %d warnings, e.g.:\n%s' % (
+            self.table_name, n_warnings, '\n'.join(messages)
+        ))
+
+
+def imported_tables(latest_only=False, type=None, types=None):
+    """Yields a HistoricalDataset for each imported table, optionally
+    restricted to a single `type` or a collection of `types`."""
+    query = 'SELECT name, type, formula, sha FROM `{system}`'.format(system=CABIN_SYSTEM_TABLE)
+    params = ()
     if type:
-        query += ' WHERE type = "%s"' % type
+        query += ' WHERE type = %s'
+        params = (type,)
     query += ' ORDER BY name'
 
     with MYSQL.cursor() as cursor:
-        cursor.execute(query)
+        cursor.execute(query, params)
         result = cursor.fetchall()
 
-        for name, formula_json, sha in result:
+        for name, type_, formula_json, sha in result:
+            # filter before parsing and hashing the (recursive) formula
+            if types is not None and type_ not in types:
+                continue
             formula = json.loads(formula_json)
             hd = HistoricalDataset(formula, name=name, sha=sha)
             if not latest_only or hd.is_latest():
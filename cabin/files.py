@@ -1,15 +1,23 @@
-import os
 import boto3
 import botocore.exceptions
 
 from pathlib import Path
+from functools import lru_cache
 from abc import abstractmethod
 
-from . import logger, settings, AbstractAttribute
+from . import settings, AbstractAttribute, CabinError
 from .io import wget
 from .core import Dataset
 
 
+@lru_cache(maxsize=None)
+def s3_client():
+    # building a client loads and parses the service model, which is far more
+    # expensive than the head/get/put requests we then make with it. Clients
+    # are thread safe; share one per process.
+    return boto3.client('s3')
+
+
 class ExternalFile(Dataset):
     """The most common (and happy) scenario for external resources, e.g. FTP
     URL for ClinVar VCF. It assumes that if a URL includes a token that is
@@ -52,11 +60,18 @@ class FTPTimestampedFile(ExternalFile):
 
     @property
     def current_ftp_version(self):
-        from cabin.io import ftp_modify_time
-        if not hasattr(self, '_current_version'):
-            timestamp = ftp_modify_time(self.ftp_server, self.ftp_path)
-            self._current_version = str(timestamp.date())
-        return self._current_version
+        return ftp_timestamp_version(self.ftp_server, self.ftp_path)
+
+
+@lru_cache(maxsize=None)
+def ftp_timestamp_version(ftp_server, ftp_path):
+    """The version (modification date) of an FTP file, looked up once per
+    process: every instantiation of a downstream Dataset creates a new
+    FTPTimestampedFile instance, each of which would otherwise log in to the
+    FTP server again."""
+    from cabin.io import ftp_modify_time
+    timestamp = ftp_modify_time(ftp_server, ftp_path)
+    return str(timestamp.date())
 
 
 class LocalFile(Dataset):
@@ -75,12 +90,8 @@ class LocalFile(Dataset):
 
     def produce(self):
         Path(settings.CABIN_DOWNLOAD_DIR).mkdir(exist_ok=True, parents=True)
-        try:
-            wget(self.input.url, self.path)
-        except: # any exception, even KeyboardInterrupt
-            logger.info('Removing partially downloaded file %s' % self.path)
-            os.unlink(self.path)
-            raise
+        # wget() removes partial downloads itself, even on KeyboardInterrupt
+        wget(self.input.url, self.path)
 
 
 class S3MirrorFile(Dataset):
@@ -128,16 +139,13 @@ class S3MirrorFile(Dataset):
             self.produce_local()
         # upload local copy to S3
         try:
-            s3 = boto3.resource('s3')
-            bucket = s3.Bucket(settings.CABIN_S3_MIRROR_BUCKET)
-            bucket.upload_file(local_path, self.s3_key)
+            s3_client().upload_file(local_path, settings.CABIN_S3_MIRROR_BUCKET, self.s3_key)
         except botocore.exceptions.ClientError:
             raise CabinError('S3 Upload failed!')
 
     def exists(self):
         try:
-            s3 = boto3.client('s3')
-            s3.head_object(Bucket=settings.CABIN_S3_MIRROR_BUCKET, Key=str(self.s3_key))
+            s3_client().head_object(Bucket=settings.CABIN_S3_MIRROR_BUCKET, Key=str(self.s3_key))
             return True
         except botocore.exceptions.ClientError:
             return False
@@ -150,6 +158,4 @@ class S3MirroredLocalFile(LocalFile):
         # special case: the file might already exist, thanks to the produce()
         # of the S3MirrorFile dependency.
         if not self.exists():
-            s3 = boto3.resource('s3')
-            bucket = s3.Bucket(settings.CABIN_S3_MIRROR_BUCKET)
-            bucket.download_file(self.input.s3_key, str(self.path))
+            s3_client().download_file(settings.CABIN_S3_MIRROR_BUCKET, self.input.s3_key, str(self.path))
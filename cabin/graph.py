@@ -58,6 +58,44 @@ def build_historical_dag(hdatasets):
     return G
 
 
+def dependency_graph(classes):
+    """Build the DAG of the given Dataset classes and all their ancestors;
+    unlike build_code_dag() nodes are classes, not names."""
+    G = nx.DiGraph()
+
+    def add_with_ancestors(cls):
+        if cls in G:
+            return
+        G.add_node(cls)
+        for dep in cls.depends:
+            add_with_ancestors(dep)
+            G.add_edge(dep, cls)
+
+    for cls in classes:
+        add_with_ancestors(cls)
+
+    return G
+
+
+def reachable_from(G, sources):
+    """Returns all nodes reachable from any of the given source nodes, i.e.
+    the union of their descendants, in a single traversal: unlike one
+    nx.descendants() per source, shared parts of the graph are only walked
+    once."""
+    for source in sources:
+        if source not in G:
+            raise nx.NetworkXError('The node %s is not in the graph.' % source)
+
+    reachable = set()
+    stack = list(sources)
+    while stack:
+        for node in G.successors(stack.pop()):
+            if node not in reachable:
+                reachable.add(node)
+                stack.append(node)
+    return reachable
+
+
 def draw_code_dag(path, tables_only=True, nodes_of_interest_glob=None):
     """Draws the dataset DAG as per current state of code, ie registry.
 
@@ -71,14 +109,8 @@ def draw_code_dag(path, tables_only=True, nodes_of_interest_glob=None):
             for node in nodes_of_interest_glob
         ], []))
 
-        descendants = set().union(*[
-            nx.algorithms.dag.descendants(G, node)
-            for node in nodes_of_interest
-        ])
-        ancestors = set().union(*[
-            nx.algorithms.dag.ancestors(G, node)
-            for node in nodes_of_interest
-        ])
+        descendants = reachable_from(G, nodes_of_interest)
+        ancestors = reachable_from(G.reverse(copy=False), nodes_of_interest)
 
         to_keep = set().union(nodes_of_interest, ancestors, descendants)
         nodes = list(G.nodes().keys())
@@ -1,6 +1,9 @@
+import io
 import os
 import csv
-import gzip
+import shutil
+import itertools
+import threading
 import subprocess
 from lxml import etree
 from ftplib import FTP
@@ -9,6 +12,61 @@ from pathlib import Path
 
 from . import logger, settings, CabinError
 
+try:
+    # optional: ISA-L's SIMD accelerated inflate, a drop-in for gzip that
+    # decompresses 2-3x faster.
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# read text sources in large chunks; the default (8 KiB) costs one read()
+# syscall per a handful of lines on the multi-MB files we ingest.
+READ_BUFFER_SIZE = 1 << 20
+
+# likewise, FifoWriter hands data to the pipe in large chunks rather than a
+# write() syscall per record.
+WRITE_BUFFER_SIZE = 1 << 20
+
+# below this size a parallel inflater does not pay for its thread pool.
+PARALLEL_GUNZIP_MIN_SIZE = 10 << 20
+
+# threads used to inflate a large gzip file, all cores by default; lowered
+# in the workers of produce_in_parallel() so that together they do not use
+# more threads than there are cores.
+PARALLEL_GUNZIP_THREADS = os.cpu_count() or 1
+
+
+def open_gzip(path):
+    """Opens a gzip file for binary reading. Large files are decompressed
+    on PARALLEL_GUNZIP_THREADS threads with rapidgzip, if installed, which
+    finds deflate block boundaries in a single gzip stream and inflates them
+    concurrently."""
+    if PARALLEL_GUNZIP_THREADS < 2:
+        return gzip.open(path, 'rb')
+
+    try:
+        import rapidgzip
+    except ImportError:
+        return gzip.open(path, 'rb')
+
+    if os.path.getsize(path) < PARALLEL_GUNZIP_MIN_SIZE:
+        return gzip.open(path, 'rb')
+    return rapidgzip.open(path, parallelization=PARALLEL_GUNZIP_THREADS)
+
+
+def open_text(path, gzipped=False, encoding=None):
+    """Opens a, possibly gzipped, text file for reading with a read buffer
+    of READ_BUFFER_SIZE."""
+    path = str(path)
+    if gzipped:
+        # GzipFile decompresses in small chunks; buffer its output generously
+        # so the text layer pulls large blocks out of the inflater.
+        return io.TextIOWrapper(
+            io.BufferedReader(open_gzip(path), buffer_size=READ_BUFFER_SIZE),
+            encoding=encoding
+        )
+    return open(path, 'r', encoding=encoding, buffering=READ_BUFFER_SIZE)
+
 
 def read_xsv(path, delimiter='\t', columns=None, header_leading_hash=True, ignore_leading_hash=False, gzipped=False, encoding=None):
     """
@@ -26,26 +84,22 @@ def read_xsv(path, delimiter='\t', columns=None, header_leading_hash=True, ignor
         ignore_leading_hash:    ignores lines with leading # from file contents.
         gzipped (bool):         Whether the given file is gzipped.
     """
-    path = str(path)
-    f = gzip.open(path, 'rt') if gzipped else open(path, 'r', encoding=encoding)
+    with open_text(path, gzipped=gzipped, encoding=encoding) as f:
+        logger.info('reading records from "{p}"'.format(p=path))
 
-    logger.info('reading records from "{p}"'.format(p=f.name))
+        if columns is None:
+            header = f.readline().strip()
+            if header_leading_hash:
+                if header[0] != '#':
+                    raise CabinError('Expected first line to start with #')
+                header = header[1:]
+            columns = header.split(delimiter)
 
-    if columns is None:
-        header = f.readline().strip()
-        if header_leading_hash:
-            if header[0] != '#':
-                raise CabinError('Expected first line to start with #')
-            header = header[1:]
-        columns = header.split(delimiter)
-
-    for line in f:
-        if ignore_leading_hash and line.startswith('#'):
-            continue
-        values = line.strip().split(delimiter)
-        yield dict(zip(columns, values))
-
-    f.close()
+        for line in f:
+            if ignore_leading_hash and line.startswith('#'):
+                continue
+            values = line.strip().split(delimiter)
+            yield dict(zip(columns, values))
 
 
 def read_csv(path, delimiter=',', quotechar='"', encoding=None):
@@ -54,7 +108,9 @@ def read_csv(path, delimiter=',', quotechar='"', encoding=None):
     enough. For example, some cells contain a citation, with a ',' in it, that
     is in quotes. eg:  "Flex E, et al. Somatically acquired JAK1".
     """
-    with open(path, encoding=encoding) as infile:
+    # newline='' leaves line endings to the csv module; required for quoted
+    # fields spanning multiple lines.
+    with open(path, encoding=encoding, newline='', buffering=READ_BUFFER_SIZE) as infile:
         csv_content = csv.reader(infile, delimiter=delimiter, quotechar=quotechar)
         header = next(csv_content)
 
@@ -63,21 +119,25 @@ def read_csv(path, delimiter=',', quotechar='"', encoding=None):
 
 
 def read_vcf(path):
+    import pysam
+
     path = str(path)
     logger.info('reading VCF records from "{p}"'.format(p=path))
-    vf = pysam.VariantFile(path)
-    for variant in vf.fetch():
-        row = {
-            'CHROM': variant.chrom,
-            'POS': variant.pos,
-            'ID': variant.id,
-            'REF': variant.ref,
-            'ALT': variant.alts,         # tuple: ('A',)
-            'QUAL': variant.qual,
-            'FILTER': variant.filter,
-            'INFO': variant.info,        # eg usage: info.get('CLNDISDB')
-        }
-        yield row
+    with pysam.VariantFile(path) as vf:
+        # iterate the file sequentially: unlike fetch(), this needs no index and
+        # skips the region iterator.
+        for variant in vf:
+            row = {
+                'CHROM': variant.chrom,
+                'POS': variant.pos,
+                'ID': variant.id,
+                'REF': variant.ref,
+                'ALT': variant.alts,         # tuple: ('A',)
+                'QUAL': variant.qual,
+                'FILTER': variant.filter,
+                'INFO': variant.info,        # eg usage: info.get('CLNDISDB')
+            }
+            yield row
 
 
 # A callback to free the memory used by elements retrieved by etree.iterparse
@@ -87,7 +147,8 @@ def xml_element_clear_memory(elem):
     elem.clear()
     # Also eliminate now-empty references from the root node to elem,
     # otherwise these dangling elements will swallow a lot of memory!
-    for ancestor in elem.xpath('ancestor-or-self::*'):
+    # (walk ancestor-or-self natively, no need for the XPath evaluator)
+    for ancestor in itertools.chain((elem,), elem.iterancestors()):
         while ancestor.getprevious() is not None:
             del ancestor.getparent()[0]
 
@@ -95,14 +156,23 @@ def xml_element_clear_memory(elem):
 def xml_element_to_string(elem):
     return etree.tostring(elem, pretty_print=True, encoding='unicode')
 
-def read_xml(source, tag):
+def read_xml(source, tag, clear=False, huge_tree=False):
     """source is either path to a plain text XML file or a file object that
-    reads in bytes."""
+    reads in bytes.
+
+    If clear is True, each yielded element is cleared (and detached from the
+    tree, see xml_element_clear_memory) as soon as the next one is requested;
+    callers must not hold on to yielded elements in that case.
+
+    huge_tree lifts libxml2's limits on tree depth and text node size; only
+    turn it on for trusted sources that need it."""
     # use an incremental parser instead of loading the entire DOM in memory
-    # NOTE users must clear the memory used by subelements retrieved via xpath
-    # or the like after use.
-    for _, elem in etree.iterparse(source, tag=tag):
+    # NOTE unless clear is True, users must clear the memory used by
+    # subelements retrieved via xpath or the like after use.
+    for _, elem in etree.iterparse(source, tag=tag, huge_tree=huge_tree):
         yield elem
+        if clear:
+            xml_element_clear_memory(elem)
 
 
 def read_obo(path):
@@ -118,8 +188,10 @@ def read_obo(path):
 
     for term in ontology.terms():
 
-        children = [child.id for child in ontology[term.id].subclasses(distance=1, with_self=False)]
-        parents = [parent.id for parent in ontology[term.id].superclasses(distance=1, with_self=False)]
+        # terms yielded by terms() are the ontology's own, no need to look
+        # them up again by id.
+        children = [child.id for child in term.subclasses(distance=1, with_self=False)]
+        parents = [parent.id for parent in term.superclasses(distance=1, with_self=False)]
 
         yield {
             '_term': term,
@@ -132,24 +204,96 @@ def read_obo(path):
         }
 
 
-def read_fasta(path, gzipped=False):
-    f = gzip.open(path, 'rt') if gzipped else open(path, 'r')
-    for record in SeqIO.parse(f, 'fasta'):
-        yield record.id, str(record.seq)
+def _fasta_record(pieces):
+    header, _, sequence = ''.join(pieces).partition('\n')
+    # like Bio.SeqIO: the id is the first word of the header (possibly empty)
+    # and all whitespace, not just line breaks, is dropped from the sequence.
+    id_ = header.split(None, 1)[0] if header.strip() else ''
+    return id_, ''.join(sequence.split())
 
-    f.close()
+
+def read_fasta(path, gzipped=False):
+    """Yields (id, sequence) tuples for the records of a FASTA file, where
+    id is the first word of the header line. Whitespace in sequences is
+    dropped and any text before the first record is ignored. Records are
+    split out of large chunks of text with str.split() rather than line by
+    line."""
+    with open_text(path, gzipped=gzipped) as f:
+        pending = None # pieces of the current record, None before the first
+        while True:
+            chunk = f.read(READ_BUFFER_SIZE)
+            if not chunk:
+                break
+            # end chunks on a line boundary so that headers are never split
+            chunk += f.readline()
+            # each record starts with a '>' at the beginning of a line
+            records = ('\n' + chunk).split('\n>')
+            if pending is not None:
+                pending.append(records[0])
+            for record in records[1:]:
+                if pending is not None:
+                    yield _fasta_record(pending)
+                pending = [record]
+
+        if pending is not None:
+            yield _fasta_record(pending)
+
+
+class FifoWriter(threading.Thread):
+    """Feeds a named pipe from a background thread: `write` is called with
+    the pipe opened for writing (in text mode) and is expected to write all
+    data to it. The thread does not raise; call close() once the reader is
+    done and check `error`."""
+
+    def __init__(self, path, write, encoding='utf-8'):
+        super().__init__(daemon=True)
+        self.path = path
+        self.write = write
+        self.encoding = encoding
+        self.error = None
+
+    def run(self):
+        try:
+            with open(self.path, 'w', encoding=self.encoding, buffering=WRITE_BUFFER_SIZE) as fifo:
+                self.write(fifo)
+        except BaseException as e:
+            self.error = e
+
+    def close(self):
+        """Waits for the writer to finish. If the reader never opened the
+        pipe, or stopped reading it (e.g. because it failed), the writer is
+        unblocked by briefly opening the read end: it then fails with a
+        BrokenPipeError instead of blocking forever."""
+        self.join(timeout=.1)
+        while self.is_alive():
+            os.close(os.open(self.path, os.O_RDONLY | os.O_NONBLOCK))
+            self.join(timeout=.1)
 
 
 def wget(source, destination):
-    cmd = ['wget', '-q', str(source), '-O', str(destination)]
+    # download next to the destination and atomically move it in place only
+    # once complete: an interrupted download never leaves a truncated file
+    # behind that would later pass for an existing dataset.
+    partial = '%s.part' % destination
+    cmd = ['wget', '-q', str(source), '-O', partial]
     if not settings.CABIN_NON_INTERACTIVE:
         cmd = cmd + ['--show-progress']
     proc = subprocess.Popen(cmd)
-    proc.communicate()
+    try:
+        proc.communicate()
+    finally:
+        if proc.returncode is None:
+            # interrupted (e.g. KeyboardInterrupt): stop wget before removing
+            # the file it is still writing to.
+            proc.kill()
+            proc.wait()
+        if proc.returncode != 0 and os.path.exists(partial):
+            os.remove(partial)
+
     if proc.returncode == 0:
+        os.replace(partial, destination)
         logger.info('Successfully downloaded to %s' % destination)
     else:
-        os.remove(destination)
         raise CabinError('Failed to download to %s' % destination)
 
 
@@ -169,9 +313,17 @@ def ftp_modify_time(ftp_server, ftp_path):
         raise CabinError('Failed to get FTP file modification time for: ' + ftp_url)
 
 
+def gunzip_command():
+    """Shell command decompressing a gzip file to stdout. Uses pigz if
+    installed: it inflates on one thread while reading, writing and
+    checksumming happen on others, noticeably faster than gzip on large
+    files."""
+    return 'pigz -dc' if shutil.which('pigz') else 'gunzip -c'
+
+
 def cut_tsv_with_zcat(src, dst):
     """ creates a file with first 5 columns only, eg: partial vcf for dbSNP"""
-    command = 'zcat {src} | cut -f 1-5,8 > {dst}'.format(src=src, dst=dst)
+    command = '{gunzip} {src} | cut -f 1-5,8 > {dst}'.format(gunzip=gunzip_command(), src=src, dst=dst)
     proc = subprocess.Popen(command, shell=True)
     proc.communicate()
     if proc.returncode:
@@ -179,7 +331,7 @@ def cut_tsv_with_zcat(src, dst):
 
 
 def gunzip(src, dst):
-    command = 'gunzip -c {src} > {dst}'.format(src=src, dst=dst)
+    command = '{gunzip} {src} > {dst}'.format(gunzip=gunzip_command(), src=src, dst=dst)
     proc = subprocess.Popen(command, shell=True)
     proc.communicate()
     if proc.returncode:
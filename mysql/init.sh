@@ -10,7 +10,8 @@ docker run \
   -d --rm --name mysql \
   -p 3306:3306 \
   -e MYSQL_ROOT_PASSWORD=cabin \
-  mysql/mysql-server:8.0
+  mysql/mysql-server:8.0 \
+  --local-infile=1
 
 for i in $(seq $SLEEP); do echo -n "."; sleep 1; done
 docker exec mysql bash -c "cat /init.sql | mysql -u root -pcabin"
@@ -2,3 +2,5 @@ CREATE DATABASE IF NOT EXISTS cabin;
 CREATE USER IF NOT EXISTS 'cabin'@'%' IDENTIFIED BY 'cabin';
 GRANT ALL PRIVILEGES ON cabin.* TO 'cabin'@'%';
 FLUSH PRIVILEGES;
+-- bulk imports use LOAD DATA LOCAL INFILE, off by default since MySQL 8.0
+SET PERSIST local_infile = 1;
@@ -0,0 +1,115 @@
+import os
+import time
+
+import pytest
+
+from cabin import CabinError
+from cabin.app import produce_in_parallel
+from cabin.core import Dataset
+
+
+# datasets are produced in worker processes: they communicate through marker
+# files in a directory passed down via the environment.
+OUTPUT_DIR = 'CABIN_TEST_OUTPUT_DIR'
+
+
+class DummyDataset(Dataset):
+    version = '1'
+    delay = 0
+
+    @property
+    def path(self):
+        return os.path.join(os.environ[OUTPUT_DIR], self.type)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def produce(self):
+        with open(self.path + '.started', 'a') as f:
+            f.write('started\n')
+        time.sleep(self.delay)
+        with open(self.path, 'w'):
+            pass
+
+
+class Root(DummyDataset):
+    # slow enough that a dataset submitted too early would find it missing
+    # and produce it a second time.
+    delay = .2
+
+
+class Left(DummyDataset):
+    depends = [Root]
+
+
+class Right(DummyDataset):
+    depends = [Root]
+    delay = .1
+
+
+class Bottom(DummyDataset):
+    depends = [Left, Right]
+
+
+class Failing(DummyDataset):
+    depends = [Root]
+
+    def produce(self):
+        raise CabinError('failed to produce')
+
+
+class Sibling1(DummyDataset):
+    depends = [Root]
+    delay = .3
+
+
+class Sibling2(Sibling1):
+    pass
+
+
+class Sibling3(Sibling1):
+    pass
+
+
+class Sibling4(Sibling1):
+    pass
+
+
+class FailingBottom(DummyDataset):
+    depends = [Failing, Sibling1, Sibling2, Sibling3, Sibling4]
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(OUTPUT_DIR, str(tmp_path))
+    return tmp_path
+
+
+def mtime(path):
+    return os.stat(str(path)).st_mtime_ns
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_produce_in_parallel(output_dir, max_workers):
+    produce_in_parallel([Bottom], max_workers=max_workers)
+
+    for cls in [Root, Left, Right, Bottom]:
+        assert (output_dir / cls.__name__).exists()
+        # shared ancestors are produced once, not by each of their children
+        assert (output_dir / (cls.__name__ + '.started')).read_text() == 'started\n'
+    for cls in [Left, Right, Bottom]:
+        for dep in cls.depends:
+            # a dataset is started only once its dependencies are produced
+            assert mtime(output_dir / dep.__name__) <= mtime(output_dir / (cls.__name__ + '.started'))
+
+
+def test_produce_in_parallel_failure(output_dir):
+    with pytest.raises(CabinError, match='failed to produce'):
+        produce_in_parallel([FailingBottom], max_workers=1)
+
+    assert not (output_dir / 'FailingBottom.started').exists()
+    # Failing runs first (in name order), the siblings queued behind it are
+    # cancelled; only those already handed to the worker may still run.
+    started = [cls for cls in [Sibling1, Sibling2, Sibling3, Sibling4]
+               if (output_dir / (cls.__name__ + '.started')).exists()]
+    assert len(started) < 4
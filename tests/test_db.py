@@ -0,0 +1,29 @@
+import pytest
+
+from cabin import CabinError
+from cabin.db import load_data_field
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('plain', 'plain'),
+    ('back\\slash', 'back\\\\slash'),
+    ('tab\tseparated', 'tab\\tseparated'),
+    ('new\nline', 'new\\nline'),
+    ('carriage\rreturn', 'carriage\\rreturn'),
+    ('nul\0byte', 'nul\\0byte'),
+    # a literal \N must not read back as NULL
+    ('\\N', '\\\\N'),
+    (None, '\\N'),
+    (True, '1'),
+    (False, '0'),
+    (42, '42'),
+    (1.5, '1.5'),
+])
+def test_load_data_field(value, expected):
+    assert load_data_field(value) == expected
+
+
+@pytest.mark.parametrize('value', [b'\x00\x01', bytearray(b'binary')])
+def test_load_data_field_binary(value):
+    with pytest.raises(CabinError, match='binary'):
+        load_data_field(value)
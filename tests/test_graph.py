@@ -0,0 +1,44 @@
+import networkx as nx
+import pytest
+
+from cabin.graph import reachable_from
+
+
+# a diamond a -> b, c -> d with a shortcut b -> f and a second root h
+# sharing c; g is unconnected.
+EDGES = [
+    ('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'),
+    ('d', 'e'), ('d', 'f'), ('b', 'f'), ('h', 'c'),
+]
+
+
+@pytest.fixture
+def dag():
+    G = nx.DiGraph(EDGES)
+    G.add_node('g')
+    return G
+
+
+def union_of(f, G, sources):
+    return set().union(*(f(G, source) for source in sources))
+
+
+@pytest.mark.parametrize('sources', [
+    [],
+    ['a'],
+    ['g'],
+    ['f'],
+    ['c', 'h'],
+    # d is reachable from b: it is part of the result
+    ['b', 'd'],
+    ['d', 'b', 'a', 'g'],
+])
+def test_reachable_from(dag, sources):
+    assert reachable_from(dag, sources) == union_of(nx.descendants, dag, sources)
+    # and upstream, as draw_code_dag() uses it
+    assert reachable_from(dag.reverse(copy=False), sources) == union_of(nx.ancestors, dag, sources)
+
+
+def test_reachable_from_missing_node(dag):
+    with pytest.raises(nx.NetworkXError):
+        reachable_from(dag, ['a', 'z'])
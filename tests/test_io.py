@@ -0,0 +1,128 @@
+import gzip
+import os
+import threading
+
+import pytest
+
+from cabin import io
+
+
+FASTA = (
+    'preamble before the first record\n'
+    '>seq1 first record\n'
+    'ACGT ACGT\n'
+    'GG\r\n'
+    '>empty\n'
+    '>seq3\n'
+    '\n'
+    'TT\tTT\n'
+    '>last\n'
+    'CCC'
+)
+
+EXPECTED = [
+    ('seq1', 'ACGTACGTGG'),
+    ('empty', ''),
+    ('seq3', 'TTTT'),
+    ('last', 'CCC'),
+]
+
+
+@pytest.mark.parametrize('buffer_size', [1, 2, 7, 16, 1 << 20])
+def test_read_fasta(tmp_path, monkeypatch, buffer_size):
+    # small buffers put chunk boundaries everywhere: inside headers, right
+    # before a '>', and within sequences.
+    monkeypatch.setattr(io, 'READ_BUFFER_SIZE', buffer_size)
+    path = tmp_path / 'seqs.fa'
+    path.write_text(FASTA)
+
+    assert list(io.read_fasta(path)) == EXPECTED
+
+
+def test_read_fasta_gzipped(tmp_path):
+    path = tmp_path / 'seqs.fa.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write(FASTA)
+
+    assert list(io.read_fasta(path, gzipped=True)) == EXPECTED
+
+
+def test_read_fasta_no_records(tmp_path):
+    path = tmp_path / 'seqs.fa'
+    path.write_text('no records here\n')
+
+    assert list(io.read_fasta(path)) == []
+
+
+LINES = ['line %d\n' % i for i in range(100000)]
+
+
+def make_fifo(tmp_path):
+    path = str(tmp_path / 'records.tsv')
+    os.mkfifo(path)
+    return path
+
+
+def start_reader(path, size=-1):
+    # a plain reader on the other end of the pipe, standing in for MySQL:
+    # reads `size` characters (all by default) and closes the pipe.
+    result = {}
+
+    def read():
+        with open(path, encoding='utf-8') as f:
+            result['data'] = f.read(size)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    return reader, result
+
+
+def test_fifo_writer(tmp_path):
+    path = make_fifo(tmp_path)
+    reader, result = start_reader(path)
+    writer = io.FifoWriter(path, lambda f: f.writelines(LINES))
+    writer.start()
+
+    reader.join(timeout=10)
+    writer.close()
+    assert writer.error is None
+    assert result['data'] == ''.join(LINES)
+
+
+def test_fifo_writer_error(tmp_path):
+    def write(f):
+        f.writelines(LINES[:10])
+        raise ValueError('bad record')
+
+    path = make_fifo(tmp_path)
+    reader, result = start_reader(path)
+    writer = io.FifoWriter(path, write)
+    writer.start()
+
+    reader.join(timeout=10)
+    writer.close()
+    # the reader sees a clean end of data, only the writer knows better
+    assert result['data'] == ''.join(LINES[:10])
+    assert isinstance(writer.error, ValueError)
+
+
+def test_fifo_writer_reader_closes_early(tmp_path):
+    path = make_fifo(tmp_path)
+    reader, result = start_reader(path, size=10)
+    writer = io.FifoWriter(path, lambda f: f.writelines(LINES))
+    writer.start()
+
+    reader.join(timeout=10)
+    writer.close()
+    assert result['data'] == ''.join(LINES)[:10]
+    assert isinstance(writer.error, BrokenPipeError)
+
+
+def test_fifo_writer_reader_never_opens(tmp_path):
+    path = make_fifo(tmp_path)
+    writer = io.FifoWriter(path, lambda f: f.writelines(LINES))
+    writer.start()
+
+    writer.close()
+    assert not writer.is_alive()
+    assert isinstance(writer.error, BrokenPipeError)